@@ -0,0 +1,6 @@
+"""Config-driven ComfyUI input watcher shared by every NLBAging deployment profile."""
+
+from .config import load_profile
+from .engine import WatcherEngine
+
+__all__ = ["load_profile", "WatcherEngine"]
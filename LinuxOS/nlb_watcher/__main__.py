@@ -0,0 +1,21 @@
+import sys
+import logging
+import argparse
+
+from .config import load_profile
+from .engine import WatcherEngine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch the shared input folder and run ComfyUI aging workflows.")
+    parser.add_argument("--config", help="Path to the watcher config JSON (default: watcher_config.json)")
+    parser.add_argument("--profile", help="Profile name from the config file (default: chosen by user)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    profile = load_profile(args.config, args.profile)
+    return WatcherEngine(profile).run_forever()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import os
+import json
+import getpass
+
+# === Defaults ===
+# Every profile in the config file is layered on top of these, so a profile
+# only needs to list the keys where it differs.
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   "watcher_config.json")
+
+DEFAULTS = {
+    # Paths ({user} is replaced by the current login name, ~ is expanded)
+    "input_dir": "/home/admin/shared_comfy_data",
+    "output_dir": "/home/admin/ComfyUI/output",
+    "workflow_path": "/home/admin/ComfyUI/user/workflows/aging_workflow.json",
+    "target_url_file": "/home/admin/shared_comfy_data/latest_aged_url.txt",
+    "comfyui_url": "http://127.0.0.1:8188",
+
+    # Pluggable stages (names are looked up in nlb_watcher.stages)
+    "url_resolver": "latest_url_file",
+    "analyzer": "filename_gender",
+    "workflow_filler": "placeholders",
+    "uploader": "http_put",
+    "finalizer": "delete_input",
+    "resolve_url_on_queue": True,  # False = resolve just before upload
+
+    # Tuning knobs
+    "workers": 1,                   # tickets in flight at once; >1 is opt-in (ComfyUI still runs one prompt at a time)
+    "batch_window": 0.5,            # seconds to coalesce duplicate watchdog events
+    "server_timeout": 300,          # seconds to wait for ComfyUI to come up
+    "request_timeout": 30,          # seconds per HTTP request to ComfyUI
+    "output_timeout": 300,          # seconds to wait for a workflow output
+    "poll_interval": 1.0,           # seconds between output directory scans
+    "input_stability_checks": 5,
+    "input_stability_wait": 1.0,
+    "output_stability_checks": 0,   # 0 = take the output as soon as it appears
+    "output_stability_wait": 4.0,
+    "upload_retries": 1,
+    "upload_retry_wait": 2.0,
+    "upload_timeout": 60,
+
+    # Prewarm: run synthetic tickets through the workflow before reporting ready
+    "prewarm": True,
+    "prewarm_runs": 2,              # first run is the cold start, the rest are warm; 0 = disabled
+    "prewarm_image_size": 512,
+    "prewarm_timeout": 900,         # seconds per run (cold model loads can be slow)
+    "prewarm_poll_interval": 0.05,  # seconds between /history checks while timing a run
+}
+
+PATH_KEYS = ("input_dir", "output_dir", "workflow_path", "target_url_file")
+
+
+def _read_config_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _resolve_profile(profiles, name, seen=()):
+    if name not in profiles:
+        raise KeyError(f"Unknown watcher profile: {name}")
+    if name in seen:
+        raise ValueError(f"Circular 'extends' in watcher profile: {name}")
+
+    profile = dict(profiles[name])
+    parent = profile.pop("extends", None)
+    if parent:
+        merged = _resolve_profile(profiles, parent, seen + (name,))
+        merged.update(profile)
+        return merged
+    return profile
+
+
+def select_profile_name(config, requested=None, user=None):
+    """Pick the profile: explicit name, then $NLB_WATCHER_PROFILE, then per-user mapping, then default."""
+    if requested:
+        return requested
+    if os.environ.get("NLB_WATCHER_PROFILE"):
+        return os.environ["NLB_WATCHER_PROFILE"]
+    user = user or getpass.getuser()
+    by_user = config.get("user_profiles", {})
+    if user in by_user:
+        return by_user[user]
+    return config["default_profile"]
+
+
+def load_profile(config_path=None, profile_name=None):
+    """Load the config file and return the fully merged, path-expanded profile dict."""
+    config_path = config_path or os.environ.get("NLB_WATCHER_CONFIG") or DEFAULT_CONFIG_PATH
+    config = _read_config_file(config_path)
+    user = getpass.getuser()
+    name = select_profile_name(config, profile_name, user)
+
+    profile = dict(DEFAULTS)
+    profile.update(_resolve_profile(config.get("profiles", {}), name))
+    for key in PATH_KEYS:
+        if profile.get(key):
+            profile[key] = os.path.expanduser(profile[key].replace("{user}", user))
+
+    profile["name"] = name
+    profile["user"] = user
+    return profile
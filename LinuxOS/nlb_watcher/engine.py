@@ -0,0 +1,304 @@
+import os
+import re
+import copy
+import json
+import time
+import queue
+import logging
+import threading
+
+import requests
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+from . import prewarm, stages
+
+
+class WatcherEngine(FileSystemEventHandler):
+    """Watches the input folder and runs each image through the profile's stages."""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.resolve_url = stages.get_stage(stages.URL_RESOLVERS, profile["url_resolver"], "URL resolver")
+        self.analyze = stages.get_stage(stages.ANALYZERS, profile["analyzer"], "analyzer")
+        self.fill_workflow = stages.get_stage(stages.WORKFLOW_FILLERS, profile["workflow_filler"], "workflow filler")
+        self.upload = stages.get_stage(stages.UPLOADERS, profile["uploader"], "uploader")
+        self.finalize = stages.get_stage(stages.FINALIZERS, profile["finalizer"], "finalizer")
+
+        self.session = requests.Session()
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = set()          # queued or in flight
+        self.last_event = {}
+        self.image_to_url = {}
+        self.processed_files = set()
+        self.file_mtimes = {}
+        self._workflow_cache = (None, None)  # (mtime, parsed workflow)
+        self._workers = []
+
+    # === Server ===
+
+    def wait_for_comfyui_server(self):
+        print("⏳ Waiting for ComfyUI server to be ready...")
+        start = time.time()
+        while time.time() - start < self.profile["server_timeout"]:
+            try:
+                r = self.session.get(self.profile["comfyui_url"], timeout=self.profile["request_timeout"])
+                if r.status_code in (200, 404):
+                    print("✅ ComfyUI server is ready.")
+                    return True
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(1)
+        print("❌ Timeout waiting for ComfyUI server.")
+        return False
+
+    # === Queueing ===
+
+    def _maybe_queue_image(self, event):
+        if event.is_directory:
+            return
+        filename = os.path.basename(event.src_path)
+        if not stages.is_image_file(filename):
+            return
+
+        filepath = os.path.join(self.profile["input_dir"], filename)
+        try:
+            current_mtime = os.path.getmtime(filepath)
+        except FileNotFoundError:
+            return  # file was deleted too quickly
+
+        with self.lock:
+            self.last_event[filename] = time.time()
+            if filename in self.pending:
+                return  # coalesced into the already queued entry
+
+            # Only requeue if it's new OR it has a changed mtime (newly copied in again)
+            if filename in self.processed_files and current_mtime == self.file_mtimes.get(filename):
+                return
+            self.file_mtimes[filename] = current_mtime
+            self.pending.add(filename)
+
+        if self.profile["resolve_url_on_queue"]:
+            url = self.resolve_url(self.profile, filename)
+            if url:
+                self.image_to_url[filename] = url
+            else:
+                self.image_to_url.pop(filename, None)
+                logging.warning(f"⚠️ No presigned URL for {filename}")
+        print(f"📸 Queued {filename}")
+        self.queue.put(filename)
+
+    def queue_existing(self):
+        for f in os.listdir(self.profile["input_dir"]):
+            self._maybe_queue_image(_ExistingFileEvent(os.path.join(self.profile["input_dir"], f)))
+
+    def on_created(self, event):
+        self._maybe_queue_image(event)
+
+    def on_modified(self, event):
+        self._maybe_queue_image(event)
+
+    # === Processing ===
+
+    def _wait_batch_window(self, image_name):
+        # Let a burst of created/modified events for the same copy settle first
+        while True:
+            with self.lock:
+                remaining = self.last_event.get(image_name, 0) + self.profile["batch_window"] - time.time()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def _wait_input_stable(self, input_path):
+        for _ in range(self.profile["input_stability_checks"]):
+            try:
+                size1 = os.path.getsize(input_path)
+                time.sleep(self.profile["input_stability_wait"])
+                size2 = os.path.getsize(input_path)
+                if size1 == size2:
+                    return True
+            except FileNotFoundError:
+                time.sleep(self.profile["input_stability_wait"])
+        return False
+
+    def _is_output_stable(self, filepath):
+        wait = self.profile["output_stability_wait"]
+        try:
+            size1 = os.path.getsize(filepath)
+            time.sleep(wait)
+            size2 = os.path.getsize(filepath)
+            if size1 != size2:
+                return False
+            time.sleep(wait)
+            return size2 == os.path.getsize(filepath)
+        except Exception as e:
+            logging.warning(f"⚠️ File at {filepath} failed size stability check: {e}")
+            return False
+
+    def load_workflow(self):
+        path = self.profile["workflow_path"]
+        mtime = os.path.getmtime(path)
+        with self.lock:
+            cached_mtime, workflow = self._workflow_cache
+            if cached_mtime != mtime:
+                with open(path, "r", encoding="utf-8") as f:
+                    workflow = json.load(f)
+                self._workflow_cache = (mtime, workflow)
+        return copy.deepcopy(workflow)
+
+    def send_image(self, image_name, output_prefix):
+        image_path = os.path.join(self.profile["input_dir"], image_name)
+        analysis = self.analyze(self.profile, image_path)
+        prompt = self.fill_workflow(self.load_workflow(), image_path, analysis, output_prefix)
+        return self.submit(prompt, image_name)
+
+    def submit(self, prompt, label):
+        """POST the prompt; returns ComfyUI's response (holding prompt_id) or None on failure."""
+        try:
+            response = self.session.post(f"{self.profile['comfyui_url']}/prompt", json=prompt,
+                                         timeout=self.profile["request_timeout"])
+            if response.status_code == 200:
+                print(f"✅ Submitted workflow for {label}")
+                return response.json()
+            print(f"❌ Submission failed: {response.status_code} {response.text}")
+        except Exception as e:
+            print(f"⚠️ Request failed: {e}")
+        return None
+
+    def find_outputs(self, prev_files, output_prefix):
+        # Exact SaveImage naming ({prefix}_00001_.png), so one prefix can never match another's files
+        pattern = re.compile(rf'^{re.escape(output_prefix)}_\d{{5}}_\.(png|jpe?g)$', re.IGNORECASE)
+        return sorted(f for f in set(os.listdir(self.profile["output_dir"])) - prev_files if pattern.match(f))
+
+    def wait_for_output(self, prev_files, output_prefix):
+        deadline = time.time() + self.profile["output_timeout"]
+        while time.time() < deadline:
+            time.sleep(self.profile["poll_interval"])
+            candidates = self.find_outputs(prev_files, output_prefix)
+            if not candidates:
+                continue
+
+            src = os.path.join(self.profile["output_dir"], candidates[0])
+            checks = self.profile["output_stability_checks"]
+            for _ in range(checks):
+                if self._is_output_stable(src):
+                    break
+                logging.info(f"⏳ Waiting for stable output file: {candidates[0]}")
+            else:
+                if checks:
+                    logging.warning(f"⚠️ File {candidates[0]} did not stabilize in time, proceeding anyway")
+            return src
+        logging.warning(f"⚠️ Timed out waiting for output with prefix {output_prefix}")
+        return None
+
+    def process_image(self, image_name):
+        print(f"🚀 Processing: {image_name}")
+        self._wait_batch_window(image_name)
+        if not self._wait_input_stable(os.path.join(self.profile["input_dir"], image_name)):
+            print("Waiting for next image...")
+            return
+
+        output_prefix = stages.make_output_prefix(image_name)
+        prev_files = set(os.listdir(self.profile["output_dir"]))
+        if self.send_image(image_name, output_prefix) is None:
+            return
+
+        print(f"🔍 Waiting for output for: {image_name}")
+        src = self.wait_for_output(prev_files, output_prefix)
+        if not src:
+            return
+
+        cleaned_name = stages.clean_output_name(image_name)
+        dst = os.path.join(self.profile["output_dir"], cleaned_name)
+        try:
+            os.replace(src, dst)
+            print(f"📄 Renamed output to: {cleaned_name}")
+        except Exception as e:
+            print(f"⚠️ Failed during output handling: {e}")
+            return
+
+        if self.profile["resolve_url_on_queue"]:
+            # Never re-read at upload time: the shared URL file may already hold the next visitor's URL
+            target_url = self.image_to_url.pop(image_name, None)
+            if not target_url:
+                logging.warning(f"⚠️ No presigned URL stored for {image_name}")
+                return
+        else:
+            target_url = self.resolve_url(self.profile, image_name)
+            if not target_url:
+                logging.warning(f"⚠️ No presigned URL available for {image_name}")
+                return
+
+        if self.upload(self.profile, dst, target_url, self.session):
+            try:
+                self.finalize(self.profile, image_name, dst)
+                # ✅ Mark this file as processed (only after successful upload & cleanup)
+                with self.lock:
+                    self.processed_files.add(image_name)
+            except Exception as e:
+                logging.error(f"❌ Cleanup failed after successful upload: {e}")
+        else:
+            logging.warning("❌ Upload failed — keeping files for retry")
+
+    def _worker(self):
+        while True:
+            image_name = self.queue.get()
+            try:
+                self.process_image(image_name)
+            except Exception as e:
+                logging.error(f"❌ Unexpected error while processing {image_name}: {e}")
+            finally:
+                with self.lock:
+                    self.pending.discard(image_name)
+                self.queue.task_done()
+
+    def start_workers(self):
+        for i in range(max(1, int(self.profile["workers"]))):
+            t = threading.Thread(target=self._worker, name=f"nlb-worker-{i}", daemon=True)
+            t.start()
+            self._workers.append(t)
+
+    def run_forever(self):
+        os.makedirs(self.profile["input_dir"], exist_ok=True)
+        os.makedirs(self.profile["output_dir"], exist_ok=True)
+        print(f"🧭 Profile: {self.profile['name']} (user: {self.profile['user']})")
+        print(f"👀 Watching input: {self.profile['input_dir']}")
+        print(f"👀 Watching output: {self.profile['output_dir']}")
+        print(f"📄 Workflow: {self.profile['workflow_path']}")
+
+        observer = Observer()
+        observer.schedule(self, self.profile["input_dir"], recursive=False)
+        observer.start()
+
+        if not self.wait_for_comfyui_server():
+            observer.stop()
+            observer.join()
+            return 1
+
+        if not self.profile["prewarm"] or self.profile["prewarm_runs"] < 1:
+            print(f"✅ Watcher ready (profile: {self.profile['name']}, prewarm disabled)")
+        elif len(prewarm.run_prewarm(self)) == self.profile["prewarm_runs"]:
+            print(f"✅ Watcher ready (profile: {self.profile['name']}, warm)")
+        else:
+            print(f"⚠️ Watcher ready (profile: {self.profile['name']}, COLD — prewarm incomplete)")
+
+        self.start_workers()
+        self.queue_existing()
+
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            observer.stop()
+        observer.join()
+        return 0
+
+
+class _ExistingFileEvent:
+    """Stand-in for a watchdog event so files already present are queued the same way."""
+
+    is_directory = False
+
+    def __init__(self, path):
+        self.src_path = path
@@ -0,0 +1,108 @@
+import os
+import random
+import shutil
+import logging
+import tempfile
+import time
+
+import requests
+
+from . import stages
+
+
+def write_synthetic_image(path, size, run):
+    from PIL import Image
+
+    # A different flat colour each run, so ComfyUI cannot serve LoadImage/VAEEncode from its cache
+    shade = 96 + 32 * (run % 4)
+    Image.new("RGB", (size, size), (shade, shade - 16, shade - 32)).save(path, "JPEG")
+
+
+def _randomize_seeds(prompt):
+    for node in prompt["prompt"].values():
+        if isinstance(node, dict) and "seed" in node.get("inputs", {}):
+            node["inputs"]["seed"] = random.randint(0, 2**48)
+
+
+def _wait_for_history(engine, prompt_id):
+    """Poll /history/{prompt_id} until ComfyUI reports the prompt finished; returns True on success."""
+    profile = engine.profile
+    url = f"{profile['comfyui_url']}/history/{prompt_id}"
+    deadline = time.time() + profile["prewarm_timeout"]
+    while time.time() < deadline:
+        try:
+            entry = engine.session.get(url, timeout=profile["request_timeout"]).json().get(prompt_id)
+        except (requests.exceptions.RequestException, ValueError):
+            entry = None
+        if entry:
+            status = entry.get("status", {})
+            if status.get("status_str") == "error":
+                logging.warning(f"⚠️ Prewarm prompt {prompt_id} failed in ComfyUI: {status.get('messages')}")
+                return False
+            if status.get("completed", True):
+                return True
+        time.sleep(profile["prewarm_poll_interval"])
+    logging.warning(f"⚠️ Timed out waiting for prewarm prompt {prompt_id}")
+    return False
+
+
+def run_prewarm(engine):
+    """Push synthetic tickets through the active workflow so models are resident before real traffic.
+
+    Returns the measured submit-to-complete latency (seconds) of each successful run; the first
+    is the cold start. Latency comes from ComfyUI's /history, so it excludes the analyzer, which
+    is timed and logged separately.
+    Failures are logged and cut the prewarm short rather than blocking the watcher.
+    """
+    profile = engine.profile
+    output_dir = profile["output_dir"]
+    latencies = []
+    work_dir = tempfile.mkdtemp(prefix="nlb_prewarm_")
+    print(f"🔥 Prewarming workflow {os.path.basename(profile['workflow_path'])} "
+          f"({profile['prewarm_runs']} synthetic run(s))...")
+
+    try:
+        for run in range(profile["prewarm_runs"]):
+            label = "cold" if run == 0 else "warm"
+            image_path = os.path.join(work_dir, f"Male_prewarm-{run}.jpg")
+            write_synthetic_image(image_path, profile["prewarm_image_size"], run)
+
+            output_prefix = stages.make_output_prefix(f"prewarm_{run}")
+            analysis_start = time.perf_counter()
+            analysis = engine.analyze(profile, image_path)
+            analysis_time = time.perf_counter() - analysis_start
+            prompt = engine.fill_workflow(engine.load_workflow(), image_path, analysis, output_prefix)
+            _randomize_seeds(prompt)
+
+            prev_files = set(os.listdir(output_dir))
+            start = time.perf_counter()
+            response = engine.submit(prompt, f"prewarm run {run + 1} ({label})")
+            if not response or not response.get("prompt_id"):
+                break
+            completed = _wait_for_history(engine, response["prompt_id"])
+            elapsed = time.perf_counter() - start
+            for output in engine.find_outputs(prev_files, output_prefix):
+                try:
+                    os.remove(os.path.join(output_dir, output))
+                except OSError as e:
+                    logging.warning(f"⚠️ Could not remove prewarm output {output}: {e}")
+            if not completed:
+                break
+
+            latencies.append(elapsed)
+            print(f"⏱️ Prewarm run {run + 1} ({label}): workflow {elapsed:.2f}s, "
+                  f"analysis {analysis_time:.2f}s")
+    except Exception as e:
+        logging.warning(f"⚠️ Prewarm failed: {e}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if len(latencies) < profile["prewarm_runs"]:
+        logging.warning("⚠️ Prewarm did not complete — first tickets may still pay the cold start")
+    if latencies:
+        warm = latencies[1:]
+        summary = f"cold {latencies[0]:.2f}s"
+        if warm:
+            summary += f", warm avg {sum(warm) / len(warm):.2f}s"
+        print(f"🔥 Prewarm done: {summary}")
+    return latencies
@@ -0,0 +1,247 @@
+"""Offline replay of the analysis stage over a folder of images, with baseline diffing.
+
+    python -m nlb_watcher.replay ../workflows/dev_files -o results.csv
+    python -m nlb_watcher.replay ../workflows/dev_files -o new.csv --baseline results.csv
+
+Results are written as CSV, or Parquet when the output ends in .parquet (needs pandas + pyarrow).
+Exits with status 1 when the diff against the baseline finds a regression.
+"""
+
+import os
+import sys
+import csv
+import time
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+from . import stages
+from .config import load_profile
+from .prewarm import write_synthetic_image
+
+# Per-process state for pool workers
+_worker_profile = None
+
+# Size of the synthetic image each worker analyzes once before timing starts
+WARMUP_IMAGE_SIZE = 512
+
+PROMPT_FIELDS = ("gender", "ethnicity", "age", "scale_by", "dominant_race")
+BASE_COLUMNS = ("file", "gender", "detected_age", "age", "dominant_race", "ethnicity",
+                "width", "height", "scale_by", "seconds")
+
+
+def _init_worker(profile, quiet):
+    global _worker_profile
+    _worker_profile = profile
+    # One core per process: the pool already spreads the images over every core
+    for var in ("OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+        os.environ.setdefault(var, "1")
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    if quiet:
+        sys.stdout = open(os.devnull, "w")
+
+    # Load the analyzer's models once up front, so every timed image is a warm call
+    analyze = stages.get_stage(stages.ANALYZERS, profile["analyzer"], "analyzer")
+    with tempfile.TemporaryDirectory(prefix="nlb_replay_") as work_dir:
+        image_path = os.path.join(work_dir, "warmup.jpg")
+        write_synthetic_image(image_path, WARMUP_IMAGE_SIZE, 0)
+        analyze(profile, image_path)
+
+
+def _analyze_one(args):
+    root, rel_path = args
+    analyze = stages.get_stage(stages.ANALYZERS, _worker_profile["analyzer"], "analyzer")
+
+    start = time.perf_counter()
+    result = analyze(_worker_profile, os.path.join(root, rel_path))
+    elapsed = time.perf_counter() - start
+
+    row = {"file": rel_path, "seconds": round(elapsed, 6)}
+    for key, value in result.items():
+        if key == "race":
+            row.update({f"race_{name}": round(conf, 4) for name, conf in value.items()})
+        else:
+            row[key] = value
+    return row
+
+
+def find_images(root):
+    images = []
+    for dirpath, _, filenames in os.walk(root):
+        for f in filenames:
+            if stages.is_image_file(f):
+                images.append(os.path.relpath(os.path.join(dirpath, f), root))
+    return sorted(images)
+
+
+def run_replay(root, profile, workers=None, quiet=True):
+    """Analyze every image under root in a process pool and return one row dict per image."""
+    images = find_images(root)
+    if not images:
+        return []
+    # Every worker holds its own copy of the models, so never start more than there are images
+    workers = min(workers or os.cpu_count() or 1, len(images))
+    chunksize = max(1, len(images) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(profile, quiet)) as pool:
+        return list(pool.map(_analyze_one, [(root, rel) for rel in images], chunksize=chunksize))
+
+
+# === Columnar I/O ===
+
+def _columns(rows):
+    race_columns = sorted({k for row in rows for k in row if k.startswith("race_")})
+    extra = sorted({k for row in rows for k in row} - set(BASE_COLUMNS) - set(race_columns))
+    return [c for c in BASE_COLUMNS if any(c in row for row in rows)] + race_columns + extra
+
+
+def write_results(path, rows):
+    columns = _columns(rows)
+    if path.endswith(".parquet"):
+        import pandas as pd
+        pd.DataFrame(rows, columns=columns).to_parquet(path, index=False)
+        return
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _parse_value(value):
+    if value in ("", None):
+        return None
+    if value in ("True", "False"):
+        return value == "True"
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def read_results(path):
+    if path.endswith(".parquet"):
+        import pandas as pd
+        frame = pd.read_parquet(path)
+        return [{k: (None if pd.isna(v) else v) for k, v in row.items()}
+                for row in frame.to_dict(orient="records")]
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        return [{k: _parse_value(v) for k, v in row.items()} for row in csv.DictReader(f)]
+
+
+# === Baseline diff ===
+
+def _median_time(rows):
+    times = [row["seconds"] for row in rows if row.get("seconds") is not None]
+    return statistics.median(times) if times else None
+
+
+def diff_results(baseline, current, age_tolerance=0, race_tolerance=5.0, time_tolerance=1.25):
+    """Compare two runs; returns (list of accuracy changes, timing summary dict)."""
+    base_by_file = {row["file"]: row for row in baseline}
+    cur_by_file = {row["file"]: row for row in current}
+    changes = []
+
+    for name in sorted(set(base_by_file) - set(cur_by_file)):
+        changes.append((name, "missing", "present", "absent"))
+    for name in sorted(set(cur_by_file) - set(base_by_file)):
+        changes.append((name, "new", "absent", "present"))
+
+    for name in sorted(set(base_by_file) & set(cur_by_file)):
+        old, new = base_by_file[name], cur_by_file[name]
+        for field in PROMPT_FIELDS:
+            if old.get(field) != new.get(field):
+                changes.append((name, field, old.get(field), new.get(field)))
+
+        old_age, new_age = old.get("detected_age"), new.get("detected_age")
+        if old_age is not None and new_age is not None and abs(new_age - old_age) > age_tolerance:
+            changes.append((name, "detected_age", old_age, new_age))
+
+        for field in sorted(k for k in set(old) | set(new) if k.startswith("race_")):
+            old_conf, new_conf = old.get(field) or 0.0, new.get(field) or 0.0
+            if abs(new_conf - old_conf) > race_tolerance:
+                changes.append((name, field, old_conf, new_conf))
+
+    base_median, cur_median = _median_time(baseline), _median_time(current)
+    ratio = cur_median / base_median if base_median and cur_median is not None else None
+    timing = {
+        "baseline_median": base_median,
+        "current_median": cur_median,
+        "ratio": ratio,
+        "unknown": ratio is None,  # cannot tell, so the speed check must not pass silently
+        "regressed": ratio is not None and ratio > time_tolerance,
+    }
+    return changes, timing
+
+
+def print_summary(rows, wall_time):
+    median = _median_time(rows)
+    print(f"🖼️ Analyzed {len(rows)} image(s) in {wall_time:.2f}s wall time")
+    if median is not None:
+        print(f"⏱️ Median per image: {median:.3f}s")
+
+
+def print_diff(changes, timing):
+    for name, field, old, new in changes:
+        print(f"❌ {name}: {field} {old} → {new}")
+    if timing["unknown"]:
+        print(f"❌ Cannot compare timing: median {timing['baseline_median']} → {timing['current_median']}")
+    else:
+        icon = "❌" if timing["regressed"] else "✅"
+        print(f"{icon} Median {timing['baseline_median']:.3f}s → {timing['current_median']:.3f}s "
+              f"(x{timing['ratio']:.2f})")
+    if not changes:
+        print("✅ No accuracy changes against baseline")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay the analysis stage over a folder of images.")
+    parser.add_argument("images", help="Folder of images (searched recursively), e.g. workflows/dev_files")
+    parser.add_argument("-o", "--output", default="replay_results.csv",
+                        help="Results file, .csv or .parquet (default: replay_results.csv)")
+    parser.add_argument("--baseline", help="Earlier results file to diff against")
+    parser.add_argument("--config", help="Path to the watcher config JSON (default: watcher_config.json)")
+    parser.add_argument("--profile", default="deepface", help="Profile whose analyzer is replayed (default: deepface)")
+    parser.add_argument("--workers", type=int, help="Processes in the pool (default: all cores)")
+    parser.add_argument("--age-tolerance", type=int, default=0,
+                        help="Allowed change in detected age, in years (default: 0)")
+    parser.add_argument("--race-tolerance", type=float, default=5.0,
+                        help="Allowed change in a race confidence, in percentage points (default: 5)")
+    parser.add_argument("--time-tolerance", type=float, default=1.25,
+                        help="Allowed ratio of median time against baseline (default: 1.25)")
+    parser.add_argument("--verbose", action="store_true", help="Keep the analyzer's per-image output")
+    args = parser.parse_args(argv)
+    if args.baseline and os.path.realpath(args.baseline) == os.path.realpath(args.output):
+        parser.error("--output must differ from --baseline, or the baseline would be overwritten")
+
+    # Check Parquet support and read the baseline up front, so neither fails after the long run
+    if any(path and path.endswith(".parquet") for path in (args.output, args.baseline)):
+        try:
+            import pandas  # noqa: F401
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            parser.error(f"Parquet results need pandas and pyarrow ({e}); use a .csv file instead")
+    baseline = read_results(args.baseline) if args.baseline else None
+
+    profile = load_profile(args.config, args.profile)
+    print(f"🧭 Replaying analyzer '{profile['analyzer']}' (profile: {profile['name']}) over {args.images}")
+
+    start = time.perf_counter()
+    rows = run_replay(args.images, profile, args.workers, quiet=not args.verbose)
+    print_summary(rows, time.perf_counter() - start)
+
+    write_results(args.output, rows)
+    print(f"📄 Results written to {args.output}")
+
+    if baseline is None:
+        return 0
+    changes, timing = diff_results(baseline, read_results(args.output),
+                                   args.age_tolerance, args.race_tolerance, args.time_tolerance)
+    print_diff(changes, timing)
+    return 1 if changes or timing["regressed"] or timing["unknown"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
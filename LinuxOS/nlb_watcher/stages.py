@@ -0,0 +1,273 @@
+import os
+import re
+import time
+import uuid
+import logging
+import threading
+
+import requests
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+TICKET_RE = re.compile(r'(ticket-[a-f0-9\-]+)', re.IGNORECASE)
+
+ETHNICITY_MAP = {
+    'asian': 'Southeast Asian',
+    'indian': 'Indian',
+    'white': 'Malay'
+}
+DEFAULT_ETHNICITY = 'Southeast Asian'
+
+# DeepFace/TensorFlow is not safe to call from several worker threads at once.
+_deepface_lock = threading.Lock()
+
+
+def is_image_file(filename):
+    return filename.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def strip_gender_prefix(filename):
+    return re.sub(r'^(Male|Female)_', '', filename, flags=re.IGNORECASE)
+
+
+def clean_output_name(input_filename):
+    # Remove 'Male' or 'Female' with surrounding underscores (or at edges)
+    cleaned_name = re.sub(r'(^|_)Male(_|$)', r'\1', input_filename, flags=re.IGNORECASE)
+    cleaned_name = re.sub(r'(^|_)Female(_|$)', r'\1', cleaned_name, flags=re.IGNORECASE)
+    cleaned_name = re.sub(r'__+', '_', cleaned_name)  # collapse double underscores
+    return cleaned_name.strip('_')  # remove leading/trailing underscores
+
+
+def make_output_prefix(label):
+    """Unique SaveImage prefix per submission, so concurrent tickets never pick up each other's output."""
+    stem = re.sub(r'[^A-Za-z0-9_-]', '_', os.path.splitext(os.path.basename(label))[0])
+    return f"nlb_{stem}_{uuid.uuid4().hex[:12]}"
+
+
+def find_ticket_url_files(input_dir, filename):
+    match = TICKET_RE.search(filename)
+    if not match:
+        return []
+    ticket_id = match.group(1).lower()
+    return [os.path.join(input_dir, f) for f in os.listdir(input_dir)
+            if ticket_id in f.lower() and f.lower().endswith('.url')]
+
+
+# === URL resolvers: (profile, filename) -> url or None ===
+
+def resolve_latest_url_file(profile, filename):
+    try:
+        with open(profile["target_url_file"], "r") as f:
+            url = f.read().strip()
+            if url:
+                return url
+    except Exception as e:
+        logging.warning(f"⚠️ Failed to read target URL: {e}")
+    return None
+
+
+def resolve_ticket_url_file(profile, filename):
+    normalized_name = strip_gender_prefix(filename)
+    if not TICKET_RE.search(normalized_name):
+        logging.warning(f"⚠️ Could not extract ticket ID from filename: {normalized_name}")
+        return None
+
+    for url_path in find_ticket_url_files(profile["input_dir"], normalized_name):
+        try:
+            with open(url_path, "r") as f:
+                url = f.read().strip()
+                logging.info(f"🔗 Matched presigned URL from file: {url_path}")
+                return url
+        except Exception as e:
+            logging.warning(f"⚠️ Failed to read presigned URL file {url_path}: {e}")
+            return None
+
+    logging.warning(f"⚠️ No .url file found for: {normalized_name}")
+    return None
+
+
+# === Analyzers: (profile, image_path) -> dict of prompt values ===
+
+def detect_gender_from_filename(filename):
+    lower = filename.lower()
+    if "female" in lower or "woman" in lower:
+        return "woman"
+    elif "male" in lower or "man" in lower:
+        return "man"
+    return None
+
+
+def map_age(age):
+    """Map the age DeepFace detected to the age injected into the prompt."""
+    if age < 15:
+        return 20
+    elif 15 <= age < 20:
+        return 25
+    elif 20 <= age < 30:
+        return 40
+    elif 30 <= age < 40:
+        return age + 15
+    elif 40 <= age <= 50:
+        return age + 5
+    return 55  # Force to 55 for anything over 50
+
+
+def scale_for_resolution(width, height):
+    """Pick the ImageScaleBy factor from the orientation-normalized resolution."""
+    short, long_ = sorted((width, height))
+    if short < 480 and long_ < 640:
+        return 3.0
+    elif short < 720 and long_ < 1080:
+        return 1.5
+    elif short < 900 and long_ < 1350:
+        return 1.2
+    return 1.0
+
+
+def analyze_filename(profile, image_path):
+    gender = detect_gender_from_filename(os.path.basename(image_path))
+    if gender:
+        print(f"🧠 Detected gender: {gender}")
+    else:
+        print("🧠 Gender not detected — no changes to prompt")
+    return {"gender": gender}
+
+
+def analyze_deepface(profile, image_path):
+    from deepface import DeepFace
+    from PIL import Image
+
+    result = analyze_filename(profile, image_path)
+
+    try:
+        with _deepface_lock:
+            analysis = DeepFace.analyze(img_path=image_path, actions=['race', 'age'], enforce_detection=False)
+        dominant = analysis[0]['dominant_race'].lower()
+        age = int(analysis[0]['age'])  # DeepFace returns float, so convert to int
+        result.update({
+            "ethnicity": ETHNICITY_MAP.get(dominant, DEFAULT_ETHNICITY),
+            "age": map_age(age),
+            "detected_age": age,
+            "dominant_race": dominant,
+            "race": {k: float(v) for k, v in analysis[0].get('race', {}).items()},
+        })
+    except Exception as e:
+        logging.warning(f"⚠️ DeepFace failed to analyze image: {e}")
+        # fallback: predicted age + dummy actual age
+        result.update({"ethnicity": DEFAULT_ETHNICITY, "age": 40, "detected_age": 25,
+                       "dominant_race": None, "race": {}})
+
+    try:
+        with Image.open(image_path) as img:
+            result["width"], result["height"] = img.size
+        result["scale_by"] = scale_for_resolution(result["width"], result["height"])
+        print(f"🖼️ Image resolution: {result['width']}x{result['height']} → scale_by = {result['scale_by']}")
+    except Exception as e:
+        logging.warning(f"⚠️ Could not read image size: {e}")
+        result["scale_by"] = 1.0  # fallback default
+
+    print(f"🎯 Detected age: {result['detected_age']} → Injected age: {result['age']}")
+    print(f"🧬 Detected ethnicity: {result['ethnicity']}")
+    return result
+
+
+# === Workflow fillers: (workflow, image_path, analysis, output_prefix) -> prompt payload ===
+
+def fill_placeholders(workflow, image_path, analysis, output_prefix=None):
+    """Inject the image, analysis values and output prefix into a copy of the workflow."""
+    replacements = {f"{{{key}}}": str(analysis[key])
+                    for key in ("gender", "ethnicity", "age") if analysis.get(key) is not None}
+
+    for node in workflow.values():
+        if not isinstance(node, dict) or "inputs" not in node:
+            continue
+        inputs = node["inputs"]
+        class_type = node.get("class_type")
+
+        if class_type == "LoadImage" and "image" in inputs:
+            inputs["image"] = image_path
+
+        elif class_type == "CLIPTextEncode" and isinstance(inputs.get("text"), str):
+            prompt_text = inputs["text"]
+            for placeholder, value in replacements.items():
+                prompt_text = prompt_text.replace(placeholder, value)
+            inputs["text"] = prompt_text
+
+        elif class_type == "ImageScaleBy" and "scale_by" in inputs and "scale_by" in analysis:
+            inputs["scale_by"] = analysis["scale_by"]
+
+        elif class_type == "SaveImage" and output_prefix:
+            inputs["filename_prefix"] = output_prefix
+
+    return {"prompt": workflow}
+
+
+# === Uploaders: (profile, image_path, target_url, session) -> bool ===
+
+def upload_http_put(profile, image_path, target_url, session=requests):
+    max_retries = profile["upload_retries"]
+    for attempt in range(1, max_retries + 1):
+        try:
+            with open(image_path, "rb") as img:
+                headers = {"Content-Type": "image/jpeg"}
+                response = session.put(target_url, data=img, headers=headers,
+                                       timeout=profile["upload_timeout"])
+            if response.status_code in [200, 201]:
+                logging.info(f"✅ Uploaded: {os.path.basename(image_path)} (attempt {attempt})")
+                return True
+            logging.warning(f"❌ Upload failed (attempt {attempt}): {response.status_code} - {response.text}")
+        except Exception as e:
+            logging.error(f"❌ Exception during upload (attempt {attempt}): {e}")
+        if attempt < max_retries:
+            time.sleep(profile["upload_retry_wait"])
+    return False
+
+
+# === Finalizers: (profile, input_filename, output_path) -> None, run after a successful upload ===
+
+def finalize_delete_input(profile, input_filename, output_path):
+    os.remove(output_path)
+    input_path = os.path.join(profile["input_dir"], input_filename)
+    if os.path.exists(input_path):
+        os.remove(input_path)
+    logging.info(f"🗑️ Cleaned up {input_filename} after successful upload")
+
+
+def finalize_delete_input_and_url(profile, input_filename, output_path):
+    finalize_delete_input(profile, input_filename, output_path)
+    for url_file_path in find_ticket_url_files(profile["input_dir"], input_filename):
+        try:
+            os.remove(url_file_path)
+            logging.info(f"🗑️ Removed URL file: {url_file_path}")
+        except Exception as e:
+            logging.warning(f"⚠️ Failed to delete URL file: {e}")
+
+
+URL_RESOLVERS = {
+    "latest_url_file": resolve_latest_url_file,
+    "ticket_url_file": resolve_ticket_url_file,
+}
+
+ANALYZERS = {
+    "filename_gender": analyze_filename,
+    "deepface": analyze_deepface,
+}
+
+WORKFLOW_FILLERS = {
+    "placeholders": fill_placeholders,
+}
+
+UPLOADERS = {
+    "http_put": upload_http_put,
+}
+
+FINALIZERS = {
+    "delete_input": finalize_delete_input,
+    "delete_input_and_url": finalize_delete_input_and_url,
+}
+
+
+def get_stage(registry, name, kind):
+    try:
+        return registry[name]
+    except KeyError:
+        raise KeyError(f"Unknown {kind} stage '{name}'. Available: {', '.join(sorted(registry))}") from None